@@ -1,6 +1,6 @@
+const crypto = require("crypto");
 const fs = require("fs/promises");
 const path = require("path");
-const nunjucks = require("nunjucks");
 
 const ROOT = __dirname;
 const DIST_ROOT = path.join(ROOT, "dist");
@@ -9,11 +9,37 @@ const IMAGES_ROOT = path.join(ROOT, "images");
 const ASSETS_ROOT = path.join(ROOT, "assets");
 const DATA_PATH = path.join(ROOT, "videos.json");
 const CONFIG_PATH = path.join(ROOT, "site.config.json");
+// Per-page input fingerprints from the last build; kept outside dist/ so it is never deployed.
+const BUILD_CACHE_PATH = path.join(ROOT, ".build-cache.json");
 const PKG = require("./package.json");
 
 const DEFAULT_BASE_URL = (process.env.SITE_BASE_URL || process.env.PUBLIC_SITES_BASE_URL || "https://sites.local").replace(/\/$/, "");
 const APP_VERSION = PKG.version || "0.1.0";
 
+// Inline placeholder for thumbnails that fail to load; a data URI avoids a second request per broken image.
+const THUMB_FALLBACK_SVG =
+  '<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 320 180">' +
+  '<rect width="320" height="180" fill="#1a1a1a"/>' +
+  '<path d="M140 68v44l38-22z" fill="#555"/></svg>';
+const THUMB_FALLBACK = `data:image/svg+xml;base64,${Buffer.from(THUMB_FALLBACK_SVG).toString("base64")}`;
+// Thumbnails are <picture>s with a WebP <source>: if that fails, drop it so the JPEG is tried, then the placeholder.
+const THUMB_ONERROR =
+  `var s=this.previousElementSibling;if(s){s.remove()}else{this.onerror=null;this.src='${THUMB_FALLBACK}'}`;
+// Index cards that are likely above the fold get eager loading and a preload hint.
+const EAGER_THUMBS = 6;
+// Catalogues smaller than this are searched by a plain scan; the trigram index only pays off above it.
+const SEARCH_INDEX_MIN_ROWS = 500;
+// Published search indexes, named search-index.<content hash>.json.
+const SEARCH_INDEX_FILE = /^search-index\.[0-9a-f]+\.json$/;
+// Index cards show this many characters of the description; the index payload ships no more than that.
+const CARD_DESC_LENGTH = 90;
+// Build stamp as written into each page's <meta name="generator"> tag.
+const GENERATOR_STAMP = /<meta name="generator" content="[^"(]*\(([^)"]+)\)">/;
+// One formatter for every count on every page, rather than a locale lookup per toLocaleString call.
+const COUNT_FORMAT = new Intl.NumberFormat("en-US");
+// Page writes kept in flight while the next page renders.
+const WRITE_CONCURRENCY = 16;
+
 function sanitizeSlug(slug) {
   return (slug || "site")
     .toString()
@@ -45,13 +71,22 @@ function shortDescription(desc) {
   return collapsed.length > 180 ? `${collapsed.slice(0, 177)}...` : collapsed;
 }
 
+const HTML_ESCAPES = { "&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;" };
+
+function escapeHtml(text) {
+  return text.replace(/[&<>"]/g, (ch) => HTML_ESCAPES[ch]);
+}
+
+// One pass over the description: links, HTML specials and line breaks are handled by a single alternation.
+// A URL stops at whitespace, < > or ", and never ends on sentence punctuation or a closing bracket.
 function linkifyDescription(desc) {
-  const escaped = (desc || "")
-    .replace(/&/g, "&amp;")
-    .replace(/</g, "&lt;")
-    .replace(/>/g, "&gt;");
-  const withLinks = escaped.replace(/(https?:\/\/[^\s]+)/gi, '<a class="link" href="$1" target="_blank" rel="noopener">$1</a>');
-  return withLinks.replace(/\r?\n/g, "<br>");
+  return (desc || "").replace(/(https?:\/\/[^\s<>"]*[^\s<>".,;:!?)\]'])|[&<>"]|\r?\n/gi, (match, url) => {
+    if (url) {
+      const safe = escapeHtml(url);
+      return `<a class="link" href="${safe}" target="_blank" rel="noopener">${safe}</a>`;
+    }
+    return HTML_ESCAPES[match] || "<br>";
+  });
 }
 
 function durationText(seconds) {
@@ -66,6 +101,19 @@ function durationText(seconds) {
   return `${m.toString().padStart(2, "0")}:${sec.toString().padStart(2, "0")}`;
 }
 
+// Same short form the index cards have always shown: 1.2M, 3.4K, or the plain count.
+function compactCount(num) {
+  if (num >= 1000000) return `${(num / 1000000).toFixed(1)}M`;
+  if (num >= 1000) return `${(num / 1000).toFixed(1)}K`;
+  return String(num);
+}
+
+// JSON safe to embed in a <script>: "</" is escaped so the payload can't close the tag early.
+function scriptJson(value) {
+  const json = JSON.stringify(value);
+  return json === undefined ? "" : json.replace(/<\//g, "<\\/");
+}
+
 function buildItemListSchema(videos, siteUrl) {
   return {
     "@context": "https://schema.org",
@@ -89,31 +137,79 @@ function buildWebPageSchema(siteName, siteUrl) {
   };
 }
 
-function buildVideoSchema(video, siteMeta, channel) {
+// `publisher` is the same object for every video, so callers build it once and share it.
+function buildVideoSchema(video, publisher) {
+  // Optional properties are only added when they have a value; schema validators flag empty strings.
   return {
     "@context": "https://schema.org",
     "@type": "VideoObject",
     name: video.title,
-    description: video.short_desc,
+    ...(video.short_desc ? { description: video.short_desc } : {}),
     thumbnailUrl: `https://i.ytimg.com/vi/${video.video_id}/hqdefault.jpg`,
-    uploadDate: video.published_at || undefined,
-    publisher: {
-      "@type": "Organization",
-      name: channel.title || siteMeta.siteName,
-    },
+    ...(video.published_at ? { uploadDate: video.published_at } : {}),
+    publisher,
     contentUrl: `https://www.youtube.com/watch?v=${video.video_id}`,
     embedUrl: `https://www.youtube.com/embed/${video.video_id}`,
   };
 }
 
-function buildFaqSchema() {
+function buildSearchIndex(rows) {
+  // Trigram -> ascending row indices. Any query token of 3+ chars must have all of its
+  // trigrams in a field it matches, so intersecting postings narrows the rows to check.
+  const postings = new Map();
+  rows.forEach((row, index) => {
+    const grams = new Set();
+    for (const field of [row._t, row._d, ...row._tags]) {
+      for (let i = 0; i + 3 <= field.length; i++) grams.add(field.slice(i, i + 3));
+    }
+    for (const gram of grams) {
+      const list = postings.get(gram);
+      if (list) list.push(index);
+      else postings.set(gram, [index]);
+    }
+  });
+  return Object.fromEntries(postings);
+}
+
+// FAQPage JSON-LD for [question, answer] pairs, or null when there are none so the template omits the block.
+function buildFaqSchema(faqs = []) {
+  if (!faqs.length) return null;
   return {
     "@context": "https://schema.org",
     "@type": "FAQPage",
-    mainEntity: [],
+    mainEntity: faqs.map(([question, answer]) => ({
+      "@type": "Question",
+      name: question,
+      acceptedAnswer: { "@type": "Answer", text: answer },
+    })),
   };
 }
 
+// Quoted strings and comments, matched in one scan so a quote inside a comment (or "/*" inside a string) is not misread.
+const CSS_STRING_OR_COMMENT = /("(?:[^"\\]|\\[\s\S])*"|'(?:[^'\\]|\\[\s\S])*')|\/\*[\s\S]*?\*\//g;
+
+// CSS minifier for the inline <style> blocks: drops comments and collapses whitespace around punctuation.
+// Quoted strings (content: "a ; b", url("x, y")) are set aside first and put back byte for byte.
+function minifyCss(css) {
+  const strings = [];
+  const code = css.replace(CSS_STRING_OR_COMMENT, (match, string) => {
+    if (!string) return "";
+    strings.push(string);
+    return `"${strings.length - 1}"`;
+  });
+  return code
+    .replace(/\s+/g, " ")
+    .replace(/\s*([{};,])\s*/g, "$1")
+    .replace(/:\s+/g, ":")
+    .replace(/;}/g, "}")
+    .trim()
+    .replace(/"(\d+)"/g, (_, index) => strings[index]);
+}
+
+function minifyStyleBlocks(html) {
+  return html.replace(/(<style[^>]*>)([\s\S]*?)(<\/style>)/gi, (_, open, css, close) => open + minifyCss(css) + close);
+}
+
 async function readJson(file, fallback) {
   try {
     const raw = await fs.readFile(file, "utf8");
@@ -124,6 +220,53 @@ async function readJson(file, fallback) {
   }
 }
 
+// Suffix counter for temp files, so overlapping writes to the same target never share one.
+let tmpCounter = 0;
+
+async function writeFileAtomic(file, contents) {
+  // Write to a sibling temp file and rename over the target so readers never see a partial file.
+  const tmp = `${file}.${process.pid}.${tmpCounter++}.tmp`;
+  await fs.writeFile(tmp, contents, "utf8");
+  await fs.rename(tmp, file);
+}
+
+function writeJson(file, value) {
+  return writeFileAtomic(file, JSON.stringify(value, null, 2));
+}
+
+// Skip the write when the file on disk already matches; resolves to whether the file was (re)written.
+async function writeFileIfChanged(file, contents, isSame = (existing, next) => existing === next) {
+  try {
+    if (isSame(await fs.readFile(file, "utf8"), contents)) return false;
+  } catch (err) {
+    if (err.code !== "ENOENT") throw err;
+  }
+  await writeFileAtomic(file, contents);
+  return true;
+}
+
+function fingerprint(value) {
+  return crypto.createHash("sha256").update(typeof value === "string" ? value : JSON.stringify(value)).digest("hex");
+}
+
+// Changes to the builder, any template, the app version or the installed nunjucks can change every page, so they
+// invalidate all cached entries.
+async function buildRenderKey() {
+  const names = (await fs.readdir(TEMPLATE_ROOT)).sort();
+  const sources = await Promise.all([__filename, ...names.map((name) => path.join(TEMPLATE_ROOT, name))].map((file) => fs.readFile(file, "utf8")));
+  const nunjucksVersion = require("nunjucks/package.json").version;
+  return fingerprint([APP_VERSION, nunjucksVersion, ...names, ...sources]);
+}
+
+async function pathExists(file) {
+  try {
+    await fs.access(file);
+    return true;
+  } catch {
+    return false;
+  }
+}
+
 async function copyDir(src, dest) {
   try {
     await fs.rm(dest, { recursive: true, force: true });
@@ -135,6 +278,13 @@ async function copyDir(src, dest) {
   }
 }
 
+// Temp files left behind by an interrupted writeFileAtomic; resolves to the number removed.
+async function removeTempFiles(entries, dir) {
+  const leftovers = entries.filter((entry) => entry.isFile() && entry.name.endsWith(".tmp"));
+  await Promise.all(leftovers.map((entry) => fs.rm(path.join(dir, entry.name), { force: true })));
+  return leftovers.length;
+}
+
 function ensureArray(value) {
   if (Array.isArray(value)) return value;
   if (value == null) return [];
@@ -167,13 +317,13 @@ async function renderDisabledSite(meta, buildStamp, siteDir) {
   </div>
 </body>
 </html>`;
-  await fs.writeFile(path.join(siteDir, "index.html"), html, "utf8");
+  await writeFileAtomic(path.join(siteDir, "index.html"), html);
   const metaJson = {
     siteEnabled: false,
     siteName: meta.siteName,
     generatedAt: buildStamp,
   };
-  await fs.writeFile(path.join(siteDir, "meta.json"), JSON.stringify(metaJson, null, 2), "utf8");
+  await writeJson(path.join(siteDir, "meta.json"), metaJson);
 }
 
 async function main() {
@@ -200,23 +350,54 @@ async function main() {
     subscriberCount: toNumber(config.subscriberCount ?? data[0]?.subs, 0),
   };
 
-  await fs.rm(DIST_ROOT, { recursive: true, force: true });
+  // dist/ is kept between builds so unchanged pages aren't rewritten; a hidden site still starts from scratch.
+  if (!siteEnabled) await fs.rm(DIST_ROOT, { recursive: true, force: true });
   await fs.mkdir(DIST_ROOT, { recursive: true });
+  const distEntries = await fs.readdir(DIST_ROOT, { withFileTypes: true });
+  await removeTempFiles(distEntries, DIST_ROOT);
+  // Pages embed the stamp of the build that wrote them; one that differs from the new render only by that stamp is unchanged.
+  const sameButStamp = (existing, next) => {
+    if (existing === next) return true;
+    const match = GENERATOR_STAMP.exec(existing);
+    return match !== null && existing.split(match[1]).join(buildStamp) === next;
+  };
+  const buildCache = await readJson(BUILD_CACHE_PATH, {});
+  let pagesWritten = 0;
+  // Writes a rendered page unless it matches what the last build wrote. With a recorded output hash from the cache,
+  // no read of the old file is needed; without one (first build, cleared cache), fall back to comparing contents.
+  async function writePage(file, html, output, previousOutput, onDisk) {
+    let written;
+    if (previousOutput === undefined) {
+      written = await writeFileIfChanged(file, html, sameButStamp);
+    } else if (previousOutput === output && onDisk) {
+      written = false;
+    } else {
+      await writeFileAtomic(file, html);
+      written = true;
+    }
+    if (written) pagesWritten += 1;
+  }
 
-  await copyDir(IMAGES_ROOT, path.join(DIST_ROOT, "images"));
-  await copyDir(ASSETS_ROOT, path.join(DIST_ROOT, "assets"));
-
+  // Static copies are independent of each other, so let them overlap.
   const staticFiles = ["robots.txt", "sitemap.xml", "indexnowkey.txt", "indexnow_key.txt", "googlef496381b95da9f1d.html", "CNAME"];
-  for (const file of staticFiles) {
-    const src = path.join(ROOT, file);
-    try {
-      await fs.copyFile(src, path.join(DIST_ROOT, file));
-    } catch (err) {
-      if (err.code !== "ENOENT") {
-        console.warn(`[mm-site] unable to copy ${file}`, err);
+  await Promise.all([
+    copyDir(IMAGES_ROOT, path.join(DIST_ROOT, "images")),
+    copyDir(ASSETS_ROOT, path.join(DIST_ROOT, "assets")),
+    ...staticFiles.map(async (file) => {
+      const src = path.join(ROOT, file);
+      const dest = path.join(DIST_ROOT, file);
+      try {
+        await fs.copyFile(src, dest);
+      } catch (err) {
+        // dist/ is kept between builds, so a file deleted from the source must be deleted from dist/ too.
+        if (err.code === "ENOENT") {
+          await fs.rm(dest, { force: true });
+        } else {
+          console.warn(`[mm-site] unable to copy ${file}`, err);
+        }
       }
-    }
-  }
+    }),
+  ]);
 
   const meta = { siteName, siteDescription, siteLogoUrl, siteUrl, siteEnabled };
 
@@ -229,19 +410,47 @@ async function main() {
   const socialLinkedIn = config.socialLinkedIn || "https://www.linkedin.com/company/MartocciMayhem";
 
   if (!siteEnabled) {
+    // dist/ was just wiped, so the cached page fingerprints describe files that no longer exist.
+    await fs.rm(BUILD_CACHE_PATH, { force: true });
     await renderDisabledSite(meta, buildStamp, DIST_ROOT);
     console.log(`[mm-site] site disabled via configuration, wrote placeholder to ${DIST_ROOT}`);
     return;
   }
 
-  const env = new nunjucks.Environment(new nunjucks.FileSystemLoader(TEMPLATE_ROOT), {
-    autoescape: false,
+  // Loaded here rather than at the top so the disabled-site path never pays for it.
+  const nunjucks = require("nunjucks");
+  // Minify <style> blocks as template sources are loaded, so the compiled templates already hold the small CSS.
+  const loader = new nunjucks.FileSystemLoader(TEMPLATE_ROOT);
+  const loadSource = loader.getSource.bind(loader);
+  loader.getSource = (name) => {
+    const source = loadSource(name);
+    if (source) source.src = minifyStyleBlocks(source.src);
+    return source;
+  };
+  const env = new nunjucks.Environment(loader, {
+    // Titles, descriptions and tags come from YouTube; escape by default and mark the few pre-built HTML/JSON values safe.
+    autoescape: true,
     trimBlocks: false,
     lstripBlocks: false,
   });
-  env.addFilter("tojson", (value) => JSON.stringify(value));
+  env.addFilter("tojson", scriptJson);
+  env.addGlobal("thumb_onerror", THUMB_ONERROR);
+
+  // Compile each template once up front; the per-video loop reuses the compiled object.
+  const indexTemplate = env.getTemplate("index_template.html", true);
+  const videoTemplate = env.getTemplate("video_template.html", true);
+  const recCardTemplate = env.getTemplate("rec_card.html", true);
+
+  // Merged caches can repeat a video_id; keep the first entry so each page is rendered once.
+  const seenIds = new Set();
+  const uniqueData = data.filter((video) => {
+    if (!video.video_id) return true;
+    if (seenIds.has(video.video_id)) return false;
+    seenIds.add(video.video_id);
+    return true;
+  });
 
-  const videos = data.map((video) => {
+  const videos = uniqueData.map((video) => {
     const slugValue = sanitizeSlug(video.slug || slugifyTitle(video.title || "video", video.video_id || "vid"));
     const desc = String(video.desc || "");
     const published = video.upload_date || video.last_edited_date || video.creation_date || null;
@@ -255,7 +464,7 @@ async function main() {
       tags: ensureArray(video.tags).map(String),
       category: video.category || "People & Blogs",
       published_at: published,
-      last_edited_date: video.last_edited_date || published || buildStamp,
+      last_edited_date: String(video.last_edited_date || published || buildStamp),
       view_count: toNumber(video.view_count),
       like_count: toNumber(video.like_count),
       comment_count: toNumber(video.comment_count),
@@ -263,47 +472,141 @@ async function main() {
     };
   });
 
-  videos.sort((a, b) => String(b.last_edited_date || "").localeCompare(String(a.last_edited_date || "")));
-
-  const itemListSchema = buildItemListSchema(videos, siteUrl);
-  const webPageSchema = buildWebPageSchema(siteName, siteUrl);
-
-  const indexHtml = env.render("index_template.html", {
+  // last_edited_date is always an ISO-8601 string here, which orders correctly as plain text; newest first.
+  videos.sort((a, b) => (a.last_edited_date < b.last_edited_date ? 1 : a.last_edited_date > b.last_edited_date ? -1 : 0));
+
+  // Index rows carry only what the index page reads: desc cut to card length for display, and lower-cased
+  // title, full description and tags for search, so browsers don't recompute them on every load.
+  const indexVideos = videos.map((video) => ({
+    video_id: video.video_id,
+    slug: video.slug,
+    title: video.title,
+    desc: video.desc.length > CARD_DESC_LENGTH ? `${video.desc.slice(0, CARD_DESC_LENGTH)}…` : video.desc,
+    category: video.category,
+    view_count: video.view_count,
+    like_count: video.like_count,
+    _t: video.title.toLowerCase(),
+    _d: video.desc.toLowerCase(),
+    _tags: video.tags.map((tag) => tag.toLowerCase()),
+    _meta: `${compactCount(video.view_count)} views · ${compactCount(video.like_count)} likes`,
+  }));
+
+  const categories = ["All", ...Array.from(new Set(videos.map((video) => video.category))).sort((a, b) => a.localeCompare(b))];
+
+
+  // Values every page shares; built once and spread into each render context.
+  const sharedContext = {
     app_version: APP_VERSION,
     build_stamp: buildStamp,
+    // Footer copyright year, taken from the build stamp rather than read from the clock per page.
+    current_year: new Date(buildStamp).getUTCFullYear(),
     site_url: siteUrl,
-    site_name: siteName,
-    site_description: siteDescription,
-    videos,
-    item_list_schema: itemListSchema,
-    web_page_schema: webPageSchema,
     socialX,
     socialTikTok,
     socialYouTube,
     socialInstagram,
     socialFacebook,
     socialLinkedIn,
+  };
+
+  // Large catalogues get the trigram index as a separate, cacheable file fetched on the first search, so page loads
+  // never carry it. Its postings are row positions in this build's __data, so the name carries a hash of the
+  // contents: a cached or half-deployed page can only ever load the index built for it. Written before index.html.
+  let searchIndexName = null;
+  if (indexVideos.length >= SEARCH_INDEX_MIN_ROWS) {
+    const searchIndexJson = JSON.stringify(buildSearchIndex(indexVideos));
+    searchIndexName = `search-index.${fingerprint(searchIndexJson).slice(0, 16)}.json`;
+    await writeFileIfChanged(path.join(DIST_ROOT, searchIndexName), searchIndexJson);
+  }
+
+  const indexHtml = indexTemplate.render({
+    ...sharedContext,
+    site_name: siteName,
+    site_description: siteDescription,
+    videos: indexVideos,
+    categories,
+    search_index_url: searchIndexName,
+    eager_thumbs: EAGER_THUMBS,
+    preload_thumbs: videos.slice(0, EAGER_THUMBS).map((video) => video.video_id),
+    // JSON-LD built in JS is serialised here once and printed as-is.
+    item_list_schema_json: scriptJson(buildItemListSchema(videos, siteUrl)),
+    web_page_schema_json: scriptJson(buildWebPageSchema(siteName, siteUrl)),
   });
 
-  await fs.writeFile(path.join(DIST_ROOT, "index.html"), indexHtml, "utf8");
+  const indexFile = path.join(DIST_ROOT, "index.html");
+  const indexOutput = fingerprint(indexHtml.split(buildStamp).join(""));
+  await writePage(indexFile, indexHtml, indexOutput, buildCache.index, await pathExists(indexFile));
+
+  // Indexes from earlier builds go once the index.html that references the new one is in place.
+  const staleSearchIndexes = distEntries.filter((entry) => SEARCH_INDEX_FILE.test(entry.name) && entry.name !== searchIndexName);
+  await Promise.all(staleSearchIndexes.map((entry) => fs.rm(path.join(DIST_ROOT, entry.name), { force: true })));
 
   const videosDir = path.join(DIST_ROOT, "videos");
   await fs.mkdir(videosDir, { recursive: true });
+  // One listing of the existing pages answers every "is it on disk?" check below and feeds the stale-page sweep.
+  // withFileTypes hands back the entry type from the directory read itself, so no per-entry stat is needed.
+  const videoEntries = await fs.readdir(videosDir, { withFileTypes: true });
+  await removeTempFiles(videoEntries, videosDir);
+  const existingPages = new Set(
+    videoEntries.filter((entry) => entry.isFile() && entry.name.endsWith(".html")).map((entry) => entry.name)
+  );
+
+  // Recommended cards draw from the same pool on every page, so render each card once and reuse the HTML.
+  // Keyed by the video object: slugs are not guaranteed unique, so two videos could otherwise share a card.
+  const recCardCache = new Map();
+  function recCardHtml(v) {
+    let html = recCardCache.get(v);
+    if (html === undefined) {
+      html = recCardTemplate.render({
+        r: {
+          slug: v.slug,
+          title: v.title,
+          desc: v.short_desc,
+          video_id: v.video_id,
+          view_count: v.view_count,
+        },
+      });
+      recCardCache.set(v, html);
+    }
+    return html;
+  }
+
+  // A page whose inputs (everything but the build stamp) match the last build is left as it is, without rendering.
+  // Output hashes stay valid across builder/template changes; input fingerprints don't.
+  const renderKey = await buildRenderKey();
+  const cachedPages = buildCache.pages || {};
+  const inputsComparable = buildCache.renderKey === renderKey;
+  const pageEntries = {};
+
+  const videoPublisher = { "@type": "Organization", name: channel.title || siteName };
+
+  // Channel details and the FAQ block are the same on every video page.
+  const videoPageContext = {
+    ...sharedContext,
+    site_logo_url: siteLogoUrl,
+    channel_title: channel.title,
+    channel_handle: channel.handle,
+    channel_handle_for_url: channel.handleForUrl,
+    subscriber_count: COUNT_FORMAT.format(channel.subscriberCount),
+    subs_known: channel.subscriberCount > 0,
+    faq_schema: buildFaqSchema(),
+  };
+
+  // Rendering is synchronous; let the file writes run behind it, capped so large catalogues don't exhaust file handles.
+  const pendingWrites = new Set();
+  // Related cards are the newest six other videos. Only the newest seven pages can differ from that list,
+  // so every other page reuses one joined block instead of rebuilding it.
+  const recentVideos = videos.slice(0, 7);
+  const relatedJoin = "\n          ";
+  const defaultRelatedHtml = recentVideos.slice(0, 6).map(recCardHtml).join(relatedJoin);
 
   for (const video of videos) {
-    const related = videos.filter((v) => v.slug !== video.slug).slice(0, 6).map((v) => ({
-      slug: v.slug,
-      title: v.title,
-      desc: v.short_desc,
-      video_id: v.video_id,
-      view_count: v.view_count,
-    }));
-
-    const html = env.render("video_template.html", {
-      app_version: APP_VERSION,
-      build_stamp: buildStamp,
-      site_url: siteUrl,
-      site_logo_url: siteLogoUrl,
+    const relatedHtml = recentVideos.includes(video)
+      ? recentVideos.filter((v) => v !== video).slice(0, 6).map(recCardHtml).join(relatedJoin)
+      : defaultRelatedHtml;
+
+    const context = {
+      ...videoPageContext,
       title: video.title,
       short_desc: video.short_desc,
       desc: video.desc,
@@ -311,30 +614,41 @@ async function main() {
       slug: video.slug,
       video_id: video.video_id,
       published_date: video.published_at,
-      view_count: video.view_count.toLocaleString("en-US"),
-      like_count: video.like_count.toLocaleString("en-US"),
-      comment_count: video.comment_count.toLocaleString("en-US"),
+      view_count: COUNT_FORMAT.format(video.view_count),
+      like_count: COUNT_FORMAT.format(video.like_count),
+      comment_count: COUNT_FORMAT.format(video.comment_count),
       duration_text: video.duration_text,
       category: video.category,
       tags: video.tags,
-      channel_title: channel.title,
-      channel_handle: channel.handle,
-      channel_handle_for_url: channel.handleForUrl,
-      subscriber_count: channel.subscriberCount.toLocaleString("en-US"),
-      subs_known: channel.subscriberCount > 0,
-      video_schema: buildVideoSchema(video, meta, channel),
-      faq_schema: buildFaqSchema(),
-      related,
-      socialX,
-      socialTikTok,
-      socialYouTube,
-      socialInstagram,
-      socialFacebook,
-      socialLinkedIn,
-    });
-
-    await fs.writeFile(path.join(videosDir, `${video.slug}.html`), html, "utf8");
+      video_schema_json: scriptJson(buildVideoSchema(video, videoPublisher)),
+      related_html: relatedHtml,
+    };
+    const pageName = `${video.slug}.html`;
+    const pageFile = path.join(videosDir, pageName);
+    const onDisk = existingPages.has(pageName);
+    const cached = cachedPages[video.slug] || {};
+    const input = fingerprint({ ...context, build_stamp: null });
+    if (inputsComparable && cached.input === input && onDisk) {
+      pageEntries[video.slug] = cached;
+      continue;
+    }
+
+    const html = videoTemplate.render(context);
+    // Hash with the build stamp removed so the next build can compare outputs without reading this file back.
+    const output = fingerprint(html.split(buildStamp).join(""));
+    pageEntries[video.slug] = { input, output };
+
+    const write = writePage(pageFile, html, output, cached.output, onDisk).finally(() => pendingWrites.delete(write));
+    pendingWrites.add(write);
+    if (pendingWrites.size >= WRITE_CONCURRENCY) await Promise.race(pendingWrites);
   }
+  await Promise.all(pendingWrites);
+  await writeJson(BUILD_CACHE_PATH, { renderKey, index: indexOutput, pages: pageEntries });
+
+  // Drop pages for videos that are no longer in the catalogue.
+  const livePages = new Set(videos.map((video) => `${video.slug}.html`));
+  const stalePages = [...existingPages].filter((name) => !livePages.has(name));
+  await Promise.all(stalePages.map((name) => fs.rm(path.join(videosDir, name), { force: true })));
 
   const metaJson = {
     siteEnabled: true,
@@ -346,16 +660,24 @@ async function main() {
     videoCount: videos.length,
     channel,
   };
-  await fs.writeFile(path.join(DIST_ROOT, "meta.json"), JSON.stringify(metaJson, null, 2), "utf8");
-  await fs.writeFile(path.join(DIST_ROOT, "videos.json"), JSON.stringify(videos, null, 2), "utf8");
+  await writeJson(path.join(DIST_ROOT, "meta.json"), metaJson);
+  await writeJson(path.join(DIST_ROOT, "videos.json"), videos);
 
   const slugMap = Object.fromEntries(videos.map((video) => [video.video_id, video.slug]));
-  await fs.writeFile(path.join(DIST_ROOT, "slugs.json"), JSON.stringify(slugMap, null, 2), "utf8");
+  await writeJson(path.join(DIST_ROOT, "slugs.json"), slugMap);
+
+  console.log(
+    `[mm-site] build completed for slug "${slug}" - ${pagesWritten}/${videos.length + 1} pages written, ` +
+      `${stalePages.length} removed - files in ${DIST_ROOT}`
+  );
+}
 
-  console.log(`[mm-site] build completed for slug "${slug}" - files in ${DIST_ROOT}`);
+// Run the build when invoked as a script; tests require the module for its helpers.
+if (require.main === module) {
+  main().catch((err) => {
+    console.error("[mm-site] build failed", err);
+    process.exit(1);
+  });
 }
 
-main().catch((err) => {
-  console.error("[mm-site] build failed", err);
-  process.exit(1);
-});
+module.exports = { linkifyDescription, minifyCss };
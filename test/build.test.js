@@ -0,0 +1,208 @@
+const assert = require("node:assert/strict");
+const { execFileSync } = require("node:child_process");
+const fs = require("node:fs");
+const os = require("node:os");
+const path = require("node:path");
+const test = require("node:test");
+
+const ROOT = path.join(__dirname, "..");
+
+// Builds run against a scratch copy of the inputs so the real dist/ and .build-cache.json are left alone.
+function makeSite() {
+  const dir = fs.mkdtempSync(path.join(os.tmpdir(), "mm-site-"));
+  for (const name of ["build.js", "package.json", "videos.json", "site.config.json"]) {
+    fs.copyFileSync(path.join(ROOT, name), path.join(dir, name));
+  }
+  fs.cpSync(path.join(ROOT, "_templates"), path.join(dir, "_templates"), { recursive: true });
+  fs.symlinkSync(path.join(ROOT, "node_modules"), path.join(dir, "node_modules"), "dir");
+  return dir;
+}
+
+function build(dir, configPatch = {}) {
+  const configPath = path.join(dir, "site.config.json");
+  const config = JSON.parse(fs.readFileSync(configPath, "utf8"));
+  fs.writeFileSync(configPath, JSON.stringify({ ...config, ...configPatch }, null, 2));
+  return execFileSync(process.execPath, ["build.js"], { cwd: dir, encoding: "utf8" });
+}
+
+function builtVideos(dir) {
+  return JSON.parse(fs.readFileSync(path.join(dir, "dist", "videos.json"), "utf8"));
+}
+
+function pageFile(dir, video) {
+  return path.join(dir, "dist", "videos", `${video.slug}.html`);
+}
+
+// Backdates a file so a later rewrite shows up as a changed mtime.
+function backdate(file) {
+  const past = new Date("2000-01-01T00:00:00Z");
+  fs.utimesSync(file, past, past);
+  return fs.statSync(file).mtimeMs;
+}
+
+test("a warm rebuild with unchanged inputs leaves every page untouched", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+
+  build(dir);
+  const files = [path.join(dir, "dist", "index.html"), ...builtVideos(dir).map((video) => pageFile(dir, video))];
+  const before = files.map((file) => ({ file, html: fs.readFileSync(file, "utf8"), mtime: backdate(file) }));
+
+  const log = build(dir);
+  assert.match(log, / 0\/\d+ pages written/);
+  for (const { file, html, mtime } of before) {
+    assert.equal(fs.statSync(file).mtimeMs, mtime, file);
+    assert.equal(fs.readFileSync(file, "utf8"), html, file);
+  }
+});
+
+test("changing a video's data rewrites its page and the index only", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+
+  build(dir);
+  const built = builtVideos(dir);
+  // The oldest video appears in no other page's Recommended list; the other page is outside the newest seven too.
+  const changed = built[built.length - 1];
+  const other = built[built.length - 2];
+  const changedBefore = fs.readFileSync(pageFile(dir, changed), "utf8");
+  const otherMtime = backdate(pageFile(dir, other));
+
+  const dataPath = path.join(dir, "videos.json");
+  const data = JSON.parse(fs.readFileSync(dataPath, "utf8"));
+  data.find((video) => video.video_id === changed.video_id).view_count += 1000;
+  fs.writeFileSync(dataPath, JSON.stringify(data));
+
+  const log = build(dir);
+  assert.match(log, / 2\/\d+ pages written/);
+  assert.notEqual(fs.readFileSync(pageFile(dir, changed), "utf8"), changedBefore);
+  assert.equal(fs.statSync(pageFile(dir, other)).mtimeMs, otherMtime);
+});
+
+test("changing a template re-renders the pages that use it", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+
+  build(dir);
+  const built = builtVideos(dir);
+  const before = fs.readFileSync(pageFile(dir, built[0]), "utf8");
+
+  fs.appendFileSync(path.join(dir, "_templates", "video_template.html"), "\n<!-- template changed -->\n");
+  const log = build(dir);
+  assert.match(log, new RegExp(` ${built.length}/${built.length + 1} pages written`));
+  assert.notEqual(fs.readFileSync(pageFile(dir, built[0]), "utf8"), before);
+});
+
+// The rows the index page embeds in <script id="__data">.
+function indexRows(dir) {
+  const html = fs.readFileSync(path.join(dir, "dist", "index.html"), "utf8");
+  return JSON.parse(/<script id="__data" type="application\/json">([\s\S]*?)<\/script>/.exec(html)[1]);
+}
+
+test("index rows show a card-length description but search the full one", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+
+  build(dir);
+  const rows = indexRows(dir);
+  const full = builtVideos(dir);
+  const long = full.findIndex((video) => video.desc.length > 200);
+  assert.notEqual(long, -1);
+  assert.equal(rows[long].desc, `${full[long].desc.slice(0, 90)}…`);
+  assert.equal(rows[long]._d, full[long].desc.toLowerCase());
+});
+
+test("re-enabling a disabled site replaces the placeholder index", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+  const indexFile = path.join(dir, "dist", "index.html");
+
+  build(dir, { siteEnabled: true });
+  build(dir, { siteEnabled: false });
+  assert.match(fs.readFileSync(indexFile, "utf8"), /currently hidden/);
+  assert.equal(fs.existsSync(path.join(dir, ".build-cache.json")), false);
+
+  const log = build(dir, { siteEnabled: true });
+  const index = fs.readFileSync(indexFile, "utf8");
+  assert.doesNotMatch(index, /currently hidden/);
+  assert.match(index, /<meta name="generator"/);
+  const [, written, total] = /(\d+)\/(\d+) pages written/.exec(log);
+  assert.equal(written, total);
+});
+
+test("leftover temp files and deleted static files are swept from dist", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+  const dist = path.join(dir, "dist");
+
+  fs.writeFileSync(path.join(dir, "CNAME"), "example.com\n");
+  build(dir);
+  assert.equal(fs.existsSync(path.join(dist, "CNAME")), true);
+
+  fs.rmSync(path.join(dir, "CNAME"));
+  fs.writeFileSync(path.join(dist, "meta.json.123.0.tmp"), "");
+  fs.writeFileSync(path.join(dist, "videos", "gone.html.123.1.tmp"), "");
+  build(dir);
+  assert.equal(fs.existsSync(path.join(dist, "CNAME")), false);
+  assert.deepEqual(fs.readdirSync(dist).filter((name) => name.endsWith(".tmp")), []);
+  assert.deepEqual(fs.readdirSync(path.join(dist, "videos")).filter((name) => name.endsWith(".tmp")), []);
+});
+
+function searchIndexNames(dir) {
+  return fs.readdirSync(path.join(dir, "dist")).filter((name) => /^search-index\.[0-9a-f]+\.json$/.test(name));
+}
+
+// Repeats the sample videos under fresh ids and slugs until the catalogue has `count` rows.
+function growCatalogue(dir, count) {
+  const dataPath = path.join(dir, "videos.json");
+  const sample = JSON.parse(fs.readFileSync(dataPath, "utf8"));
+  const data = Array.from({ length: count }, (_, i) => ({
+    ...sample[i % sample.length],
+    video_id: `vid${i}`,
+    slug: `video-${i}`,
+    title: `${sample[i % sample.length].title} part ${i}`,
+  }));
+  fs.writeFileSync(dataPath, JSON.stringify(data));
+}
+
+test("small catalogues ship no search index file", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+  const staleIndex = path.join(dir, "dist", "search-index.0123456789abcdef.json");
+
+  build(dir);
+  fs.writeFileSync(staleIndex, "{}");
+  build(dir);
+  assert.deepEqual(searchIndexNames(dir), []);
+  assert.match(fs.readFileSync(path.join(dir, "dist", "index.html"), "utf8"), /SEARCH_INDEX_URL = null;/);
+});
+
+test("large catalogues publish a content-named search index matching their rows", (t) => {
+  const dir = makeSite();
+  t.after(() => fs.rmSync(dir, { recursive: true, force: true }));
+
+  growCatalogue(dir, 520);
+  build(dir);
+  const [name, ...others] = searchIndexNames(dir);
+  assert.ok(name);
+  assert.deepEqual(others, []);
+  assert.match(fs.readFileSync(path.join(dir, "dist", "index.html"), "utf8"), new RegExp(`SEARCH_INDEX_URL = "${name.replace(/\./g, "\\.")}";`));
+
+  // Every posting list is exactly the rows whose search fields contain that trigram.
+  const rows = indexRows(dir);
+  const postings = JSON.parse(fs.readFileSync(path.join(dir, "dist", name), "utf8"));
+  for (const [gram, list] of Object.entries(postings)) {
+    const expected = [];
+    rows.forEach((row, index) => {
+      if ([row._t, row._d, ...row._tags].some((field) => field.includes(gram))) expected.push(index);
+    });
+    assert.deepEqual(list, expected, gram);
+  }
+
+  // A different catalogue gets a different name, and the old index is removed.
+  growCatalogue(dir, 530);
+  build(dir);
+  const [next, ...rest] = searchIndexNames(dir);
+  assert.notEqual(next, name);
+  assert.deepEqual(rest, []);
+});
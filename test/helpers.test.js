@@ -0,0 +1,50 @@
+const assert = require("node:assert/strict");
+const test = require("node:test");
+
+const { linkifyDescription, minifyCss } = require("../build.js");
+
+test("minifyCss drops comments and whitespace around punctuation", () => {
+  const css = `
+    /* layout */
+    .card , .hero {
+      margin: 0 auto ;
+      color: #fff;
+    }
+  `;
+  assert.equal(minifyCss(css), ".card,.hero{margin:0 auto;color:#fff}");
+});
+
+test("minifyCss leaves quoted strings untouched", () => {
+  assert.equal(minifyCss('.a::after { content: "a ; b" ; }'), '.a::after{content:"a ; b"}');
+  assert.equal(minifyCss(".b { background: url(\"x, y.png\") ; }"), '.b{background:url("x, y.png")}');
+  assert.equal(minifyCss(".c { content: 'it\\'s  {here}' }"), ".c{content:'it\\'s  {here}'}");
+  // Comment markers inside a string are not comments, and quotes inside a comment are not strings.
+  assert.equal(minifyCss('.d { content: "/* x */" } /* don\'t */ .e { top: 0 }'), '.d{content:"/* x */"}.e{top:0}');
+});
+
+test("linkifyDescription escapes markup and quotes", () => {
+  assert.equal(linkifyDescription("<script>alert(1)</script>"), "&lt;script&gt;alert(1)&lt;/script&gt;");
+  assert.equal(linkifyDescription('say "hi" & <b>bye</b>'), "say &quot;hi&quot; &amp; &lt;b&gt;bye&lt;/b&gt;");
+});
+
+test("linkifyDescription links URLs without letting them break out of the attribute", () => {
+  const link = (href) => `<a class="link" href="${href}" target="_blank" rel="noopener">${href}</a>`;
+  assert.equal(linkifyDescription("https://x.com/?a=1&b=2"), link("https://x.com/?a=1&amp;b=2"));
+  assert.equal(
+    linkifyDescription('https://x.com/"onmouseover="alert(1)'),
+    `${link("https://x.com/")}&quot;onmouseover=&quot;alert(1)`
+  );
+  assert.equal(linkifyDescription("https://x.com/<script>"), `${link("https://x.com/")}&lt;script&gt;`);
+});
+
+test("linkifyDescription keeps trailing punctuation out of links", () => {
+  const link = (href) => `<a class="link" href="${href}" target="_blank" rel="noopener">${href}</a>`;
+  assert.equal(linkifyDescription("Visit https://x.com/page."), `Visit ${link("https://x.com/page")}.`);
+  assert.equal(linkifyDescription("(see https://x.com/a)"), `(see ${link("https://x.com/a")})`);
+  assert.equal(linkifyDescription("https://x.com/a, https://y.com/b!"), `${link("https://x.com/a")}, ${link("https://y.com/b")}!`);
+});
+
+test("linkifyDescription turns line breaks into <br>", () => {
+  assert.equal(linkifyDescription("a\nb\r\nc"), "a<br>b<br>c");
+  assert.equal(linkifyDescription("https://x.com/a\nnext"), `<a class="link" href="https://x.com/a" target="_blank" rel="noopener">https://x.com/a</a><br>next`);
+});